@@ -1,21 +1,33 @@
-import pandas as pd
-from sklearn.cluster import KMeans
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from joblib import Parallel, delayed
 import matplotlib.pyplot as plt
 import seaborn as sns
-import os 
+import os
+
+from transform import load_df
+
+def fit_k(k, X):
+    """Fit one elbow candidate and report its inertia"""
+    kmeans = MiniBatchKMeans(n_clusters=k, batch_size=4096, n_init=3, random_state=37, max_iter=100)
+    kmeans.fit(X)
+    return k, kmeans.inertia_
 
 # Get script directory
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-try: 
-    # Load model ready data
-    model_data_path = os.path.normpath(os.path.join(script_dir, "../datasets/processed/model_ready_features.csv"))
-    model_df = pd.read_csv(model_data_path)
+try:
+    # Load model ready data (sparse CSR matrix + household index)
+    model_data_path = os.path.normpath(os.path.join(script_dir, "../datasets/processed/model_ready_features.npz"))
+    X = sparse.load_npz(model_data_path)
+    index_path = os.path.normpath(os.path.join(script_dir, "../datasets/processed/model_ready_index.npy"))
+    household_index = np.load(index_path)
     print("Model data loaded successfully")
 
     # Load original data
-    orginal_data_path = os.path.normpath(os.path.join(script_dir, "../datasets/processed/customer_features.csv"))
-    orginal_df = pd.read_csv(orginal_data_path)
+    orginal_data_path = os.path.normpath(os.path.join(script_dir, "../datasets/processed/customer_features.parquet"))
+    orginal_df = load_df(orginal_data_path)
     print("data loaded ")
 
 except FileNotFoundError as e:
@@ -25,20 +37,25 @@ except Exception as e:
     print(f"error: {e}")
     exit(1)
 
-# 
-model_df.set_index("household_id", inplace=True)
-print(f"Model data shape: {model_df.shape}")
+#
+print(f"Model data shape: {X.shape}")
 
-# optimal 
+# optimal
 print("Searching for optimal K value...")
-k_list = []
 k_range = range(1, 11)
 
-for k in k_range:
-    kmeans = KMeans(n_clusters=k, random_state=37)
-    kmeans.fit(model_df)
-    k_list.append(kmeans.inertia_)
-    print(f"K={k}: Inertia={kmeans.inertia_}")
+# K=1 needs no fit at all: its inertia is the total squared deviation from
+# the column mean, one pass over the matrix
+col_mean = np.asarray(X.mean(axis=0)).ravel()
+inertia_k1 = float(X.multiply(X).sum() - X.shape[0] * np.dot(col_mean, col_mean))
+k_list = [inertia_k1]
+print(f"K=1: Inertia={inertia_k1}")
+
+# the K=2..10 fits are independent, run them across cores
+results = Parallel(n_jobs=-1, backend="loky")(delayed(fit_k)(k, X) for k in k_range[1:])
+for k, inertia in sorted(results):
+    k_list.append(inertia)
+    print(f"K={k}: Inertia={inertia}")
 """
 # Elbow Method plot
 plt.figure(figsize=(10, 6))
@@ -56,20 +73,31 @@ plt.show()
 
 optimal_k = 5
 kmeans = KMeans(n_clusters=optimal_k, init='k-means++', random_state=42, n_init=10)
-clusters = kmeans.fit_predict(model_df)
+clusters = kmeans.fit_predict(X)
 
+# the cluster assignment below is purely positional; the saved index proves
+# the matrix rows are still in customer_features order
+assert np.array_equal(household_index, orginal_df["household_id"].to_numpy()), \
+    "model matrix rows do not match customer_features order"
 orginal_df["cluster"] = clusters
 
-cluster_profile = orginal_df.groupby("cluster").agg({
+cluster_profile = orginal_df.groupby("cluster", observed=True).agg({
     "total_sales": ["mean", "count"],
     "basket_count": ["mean"],
     "recency": ["mean"],
     'total_coupons_redeemed': ['mean'],
-    'discount_ratio': ['mean'],
-    'income_desc': lambda x: x.mode()[0], 
-    'age_desc': lambda x: x.mode()[0]      
+    'discount_ratio': ['mean']
 }).round(2)
 
+# per-cluster mode via hashed groupby size + argmax, no python lambda per group
+for col in ["income_desc", "age_desc"]:
+    col_mode = (orginal_df.groupby(["cluster", col], observed=True, sort=False)
+                .size().reset_index(name="n")
+                .sort_values("n", ascending=False)
+                .drop_duplicates("cluster")
+                .set_index("cluster")[col])
+    cluster_profile[(col, "mode")] = col_mode
+
 
 """
 plt.figure(figsize=(12, 8))
@@ -1,57 +1,70 @@
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
 import os
 
+from transform import load_df
+
 # Dosya yolu kontrolü
-file_path = "../datasets/processed/customer_features.csv"
+file_path = "../datasets/processed/customer_features.parquet"
 if not os.path.exists(file_path):
     print(f"not found: {file_path}")
-    
 
-customer_features_df = pd.read_csv(file_path)
+
+customer_features_df = load_df(file_path)
 print(f"data loaded: {customer_features_df.shape[0]} row, {customer_features_df.shape[1]} column")
 
 demographic_cols = ["age_desc", "marital_status_code", "income_desc", 
                     "homeowner_desc", "hh_comp_desc", "household_size_desc", 
                     "kid_category_desc"]
 
-for col in demographic_cols:
-    if col in customer_features_df.columns:
-        customer_features_df[col] = customer_features_df[col].fillna("Unknown", inplace=True)
+demographic_cols2 = [col for col in demographic_cols if col in customer_features_df.columns]
 
-# one hot encoding
+# fillna(..., inplace=True) returns None, so the old per-column loop was
+# overwriting every demographic column with None. One vectorized fillna over
+# the block instead; the object round-trip lets already-categorical columns
+# accept the new "Unknown" label before going back to category codes.
+customer_features_df[demographic_cols2] = (customer_features_df[demographic_cols2]
+                                           .astype("object")
+                                           .fillna("Unknown")
+                                           .astype("category"))
+
+# one hot encoding (sparse, the dummy columns are almost all zero)
 categorical_cols = customer_features_df.select_dtypes(include=["object", "category"]).columns.drop(["segment", "frequency_segment", "overall_segment"])
 
-customer_features_encoded = pd.get_dummies(customer_features_df, columns=categorical_cols, drop_first=True)
+encoder = OneHotEncoder(sparse_output=True, drop="first", dtype=np.float32)
+encoded_cats = encoder.fit_transform(customer_features_df[categorical_cols])
 
-# feature scaling
-num_cols = ["total_sales", "basket_count", "avg_basket_size", "days_since_last_purchase", "total_discount", 
+# feature scaling ("recency" is the column create_customer_features actually
+# writes; the old "days_since_last_purchase" name never matched anything)
+num_cols = ["total_sales", "basket_count", "avg_basket_size", "recency",
+                  "total_retail_disc", "total_coupon_disc", "total_discount",
                   "total_coupons_redeemed", "discount_ratio"]
 
 num_cols2 = []
 for col in num_cols:
-    if col in customer_features_encoded.columns:
+    if col in customer_features_df.columns:
         num_cols2.append(col)
 
-scaler = StandardScaler()
-scaled_num_cols = scaler.fit_transform(customer_features_encoded[num_cols2])
+# one float32 extraction, scaled in place instead of per-step copies
+num_arr = customer_features_df[num_cols2].to_numpy(dtype=np.float32)
+scaler = StandardScaler(copy=False)
+scaler.fit_transform(num_arr)
 
-scaled_numerical_df = pd.DataFrame(scaled_num_cols, columns=num_cols2, index=customer_features_encoded.index)
+# sparse dummies + dense scaled numerics in one CSR matrix for KMeans
+model_ready_matrix = sparse.hstack([encoded_cats, sparse.csr_matrix(num_arr)]).tocsr()
+model_ready_index = customer_features_df["household_id"]
 
-model_ready_df = customer_features_encoded.drop(columns=num_cols2)
-model_ready_df = pd.concat([model_ready_df, scaled_numerical_df], axis=1)
-
-model_ready_df.set_index("household_id", inplace=True)
-
-
-model_ready_df.drop(columns=["segment", "frequency_segment", "overall_segment"], inplace=True)
-
-print(model_ready_df.head())
+print(f"model ready matrix: {model_ready_matrix.shape[0]} row, {model_ready_matrix.shape[1]} column")
 
 if __name__ == "__main__":
 
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    output_path = os.path.join(script_dir, "../datasets/processed/model_ready_features.csv")
+    output_path = os.path.join(script_dir, "../datasets/processed/model_ready_features.npz")
     output_path = os.path.normpath(output_path)
-    model_ready_df.to_csv(output_path)
+    sparse.save_npz(output_path, model_ready_matrix)
+
+    index_path = os.path.normpath(os.path.join(script_dir, "../datasets/processed/model_ready_index.npy"))
+    np.save(index_path, model_ready_index.to_numpy())
     print(f"\nModel ready data '{output_path}' saved with success")
\ No newline at end of file
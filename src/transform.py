@@ -1,98 +1,132 @@
 import pandas as pd
 import os
+import re
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Compiled once; normalize_cols runs on every raw dataset
+_NONALNUM = re.compile(r"[^a-z0-9]+")
+_MULTI_UNDERSCORE = re.compile(r"_+")
+
+# Narrow dtypes for the biggest raw file; skips type sniffing on read and
+# halves the bandwidth of every downstream aggregation. Keyed by the raw
+# headers (mostly uppercase, household_key is not) because the map is applied
+# at read time, before normalize_cols runs
+TRANS_TYPES = {
+    "household_key": "int32",
+    "BASKET_ID": "int64",
+    "DAY": "int16",
+    "PRODUCT_ID": "int32",
+    "QUANTITY": "float32",
+    "SALES_VALUE": "float32",
+    "RETAIL_DISC": "float32",
+    "COUPON_DISC": "float32",
+    "COUPON_MATCH_DISC": "float32"
+}
 
 def normalize_cols(df):
     """Normalize column names to lowercase with underscores"""
-    df.columns = (df.columns
-        .str.strip().str.lower()
-        .str.replace(r"[^a-z0-9]+", "_", regex=True)   
-        .str.replace(r"_+", "_", regex=True)           
-        .str.strip("_")                                
-    )
+    df.columns = [
+        _MULTI_UNDERSCORE.sub("_", _NONALNUM.sub("_", c.strip().lower())).strip("_")
+        for c in df.columns
+    ]
     return df
 
+def save_df(df, path):
+    """Save a dataframe as parquet (columnar, typed and compressed)"""
+    df.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
+
+def load_df(path):
+    """Load a parquet file written by save_df"""
+    return pd.read_parquet(path, engine="pyarrow")
+
 def create_customer_features(transaction, hh_demographic, coupon_redempt):
     """Create comprehensive customer features including RFM analysis and discount behavior"""
     
     
-    t = transaction[["household_id", "basket_id", "day", "sales_value"]].copy()
-    basket_sum = t.groupby("household_id").agg(
+    # abs() once at column level so the aggregation stays on the cython path;
+    # the slim working set keeps assign from duplicating the full-width
+    # transaction table just to add two helper columns
+    t = transaction[["household_id", "basket_id", "day", "sales_value"]].assign(
+        retail_disc_abs=transaction["retail_disc"].abs(),
+        coupon_disc_abs=transaction["coupon_disc"].abs()
+    )
+
+    # single pass over household_id instead of three separate groupbys
+    basket_sum = t.groupby("household_id", sort=False, observed=True).agg(
         total_sales=("sales_value", "sum"),
-        basket_count=("basket_id", "nunique")
+        basket_count=("basket_id", "nunique"),
+        last_purchase_day=("day", "max"),
+        total_retail_disc=("retail_disc_abs", "sum"),
+        total_coupon_disc=("coupon_disc_abs", "sum")
     ).reset_index()
-    
-    basket_sum["avg_basket_size"] = basket_sum["total_sales"] / basket_sum["basket_count"]
-    
-    # customer segmentation based total sales
-    bins = [0, 1000, 2500, 5000, np.inf]
-    labels = ["Low", "Avg", "High", "VIP"]
-    basket_sum["segment"] = pd.cut(basket_sum["total_sales"], bins=bins, labels=labels)
-    
-    # freq segmentation
-    basket_sum["frequency_segment"] = pd.qcut(basket_sum["basket_count"], 
-                                              q=4, 
-                                              labels=["Rare", "Occasional", "Frequent", "Very Frequent"])
-    
-    basket_sum["overall_segment"] = basket_sum["segment"].astype(str) + ' - ' + basket_sum["frequency_segment"].astype(str)
-    
-    # recency 
+
+    # all derived numeric features in one pass over the G-row arrays,
+    # instead of one pandas temporary per expression
     analysis_day = transaction["day"].max()
-    last_purchase_df = transaction.groupby("household_id")["day"].max().reset_index()
-    last_purchase_df.rename(columns={"day": "last_purchase_day"}, inplace=True)
-    last_purchase_df["recency"] = analysis_day - last_purchase_df["last_purchase_day"]
-    
-    # merging recency with basket summary
-    basket_sum = pd.merge(basket_sum, last_purchase_df[['household_id', 'recency']], on='household_id', how='left')
-    
-    # discount
-    discount_features = transaction.groupby("household_id").agg({
-        "retail_disc": lambda x: x.abs().sum(),
-        "coupon_disc": lambda x: x.abs().sum()
-    }).reset_index()
-    
-    discount_features.rename(columns={
-        "retail_disc": "total_retail_disc", 
-        "coupon_disc": "total_coupon_disc"
-    }, inplace=True)
+    total_sales = basket_sum["total_sales"].to_numpy(np.float32)
+    basket_count = basket_sum["basket_count"].to_numpy(np.float32)
+    total_retail_disc = basket_sum["total_retail_disc"].to_numpy(np.float32)
+    total_coupon_disc = basket_sum["total_coupon_disc"].to_numpy(np.float32)
+    last_purchase_day = basket_sum["last_purchase_day"].to_numpy(np.int32)
+
+    total_discount = total_retail_disc + total_coupon_disc
+    basket_sum["avg_basket_size"] = total_sales / basket_count
+    basket_sum["recency"] = analysis_day - last_purchase_day
+    basket_sum["total_discount"] = total_discount
+    with np.errstate(divide="ignore", invalid="ignore"):
+        basket_sum["discount_ratio"] = np.where(total_sales != 0, total_discount / total_sales, 0.0)
+    basket_sum.drop(columns=["last_purchase_day"], inplace=True)
+
+    # customer segmentation based total sales; searchsorted over the fixed
+    # edges gives the same right-closed bins as pd.cut without the
+    # IntervalIndex build; code -1 reproduces pd.cut's NaN for totals
+    # outside (0, inf], i.e. zero/negative sales
+    sales_edges = np.array([1000, 2500, 5000], dtype=np.float32)
+    sales_codes = np.where(total_sales > 0,
+                           np.searchsorted(sales_edges, total_sales, side="left"), -1)
+    basket_sum["segment"] = pd.Categorical.from_codes(sales_codes, ["Low", "Avg", "High", "VIP"])
+
+    # freq segmentation (quartile edges computed once, same as pd.qcut)
+    freq_edges = np.quantile(basket_count, [0.25, 0.5, 0.75])
+    freq_codes = np.searchsorted(freq_edges, basket_count, side="left")
+    basket_sum["frequency_segment"] = pd.Categorical.from_codes(
+        freq_codes, ["Rare", "Occasional", "Frequent", "Very Frequent"])
     
-    discount_features["total_discount"] = discount_features["total_retail_disc"] + discount_features["total_coupon_disc"]
+    basket_sum["overall_segment"] = (basket_sum["segment"].astype(str) + ' - ' + basket_sum["frequency_segment"].astype(str)).astype("category")
     
     # coupon
-    coupon_usage = coupon_redempt.groupby("household_id").size().reset_index(name="total_coupons_redeemed")
-    
-    # merging 
-    customer_features = pd.merge(basket_sum, discount_features, on="household_id", how="left")
-    customer_features = pd.merge(customer_features, coupon_usage, on="household_id", how="left")
-    
-    # missing values
-    customer_features["total_discount"] = customer_features["total_discount"].fillna(0)
+    coupon_usage = coupon_redempt.groupby("household_id", sort=False, observed=True).size().rename("total_coupons_redeemed")
+
+    # merging coupon usage and demographics in one join over the household_id
+    # index instead of rebuilding a merge hashtable per table
+    customer_features = (basket_sum.set_index("household_id")
+                         .join([coupon_usage, hh_demographic.set_index("household_id")], how="left")
+                         .reset_index())
+
+    # missing values (only the coupon join can introduce NaN now)
     customer_features["total_coupons_redeemed"] = customer_features["total_coupons_redeemed"].fillna(0)
-    
-    # discount ratio
-    customer_features["discount_ratio"] = (customer_features["total_discount"] / customer_features["total_sales"]).fillna(0)
-    
-    # Adding demogrphic info 
-    customer_features = pd.merge(customer_features, hh_demographic, on="household_id", how="left")
-    
+
     return customer_features
 
 def create_product_analysis(transaction, product, basket_sum):
     """Create product analysis with customer segments"""
     
-    # Merge transaction data with customer segments
-    trans_with_segment = pd.merge(transaction, basket_sum[["household_id", "segment"]], on="household_id", how='left')
-    
-    # Full product analysis dataset
-    full_df = pd.merge(trans_with_segment, product, on="product_id", how="left")
-    
-    # Product performance by segment
-    product_segment_performance = full_df.groupby(["department", "segment"])["sales_value"].sum().reset_index()
-    
-    # Top products by segment
-    top_products_by_segment = full_df.groupby(["product_id", "segment"])["sales_value"].sum().reset_index()
-    
-    return full_df, product_segment_performance, top_products_by_segment
+    # Merge only the columns the aggregations need with customer segments
+    trans_with_segment = pd.merge(transaction[["household_id", "product_id", "sales_value"]],
+                                  basket_sum[["household_id", "segment"]],
+                                  on="household_id", how='left')
+
+    # Top products by segment, aggregated before touching product attributes
+    top_products_by_segment = trans_with_segment.groupby(["product_id", "segment"], observed=True, sort=False)["sales_value"].sum().reset_index()
+
+    # Product performance by segment: join department onto the already
+    # aggregated rows instead of replicating it across every transaction
+    product_segment_performance = (top_products_by_segment
+                                   .merge(product[["product_id", "department"]], on="product_id", how="left")
+                                   .groupby(["department", "segment"], observed=True, sort=False)["sales_value"].sum().reset_index())
+
+    return product_segment_performance, top_products_by_segment
 
 def process_datasets():
     """Process raw datasets and save to processed folder"""
@@ -107,15 +141,40 @@ def process_datasets():
     print(f"Reading from: {raw_dir}")
     print(f"Saving to: {processed_dir}")
     
-    # Loading raw datasets
-    camp_desc = pd.read_csv(os.path.join(raw_dir, "campaign_desc.csv"))
-    camp_table = pd.read_csv(os.path.join(raw_dir, "campaign_table.csv"))
-    causal_data = pd.read_csv(os.path.join(raw_dir, "causal_data.csv"))
-    coupon_redempt = pd.read_csv(os.path.join(raw_dir, "coupon_redempt.csv"))
-    coupon = pd.read_csv(os.path.join(raw_dir, "coupon.csv"))
-    hh_demographic = pd.read_csv(os.path.join(raw_dir, "hh_demographic.csv"))
-    product = pd.read_csv(os.path.join(raw_dir, "product.csv"))
-    transaction = pd.read_csv(os.path.join(raw_dir, "transaction_data.csv"))
+    # Loading raw datasets in parallel (pyarrow engine: multithreaded C++
+    # parse, no python level type sniffing; the parser releases the GIL)
+    raw_files = {
+        "camp_desc": "campaign_desc.csv",
+        "camp_table": "campaign_table.csv",
+        "causal_data": "causal_data.csv",
+        "coupon_redempt": "coupon_redempt.csv",
+        "coupon": "coupon.csv",
+        "hh_demographic": "hh_demographic.csv",
+        "product": "product.csv",
+        "transaction": "transaction_data.csv"
+    }
+
+    def read_raw(filename):
+        dtypes = TRANS_TYPES if filename == "transaction_data.csv" else None
+        return pd.read_csv(os.path.join(raw_dir, filename), engine="pyarrow", dtype=dtypes)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        raw_dfs = dict(zip(raw_files, executor.map(read_raw, raw_files.values())))
+
+    camp_desc = raw_dfs["camp_desc"]
+    camp_table = raw_dfs["camp_table"]
+    causal_data = raw_dfs["causal_data"]
+    coupon_redempt = raw_dfs["coupon_redempt"]
+    coupon = raw_dfs["coupon"]
+    hh_demographic = raw_dfs["hh_demographic"]
+    product = raw_dfs["product"]
+    transaction = raw_dfs["transaction"]
+
+    # read_csv silently drops dtype keys that miss the file's headers, which
+    # would quietly fall back to int64/float64 parsing; fail loudly instead
+    missing_dtype_cols = set(TRANS_TYPES) - set(transaction.columns)
+    assert not missing_dtype_cols, \
+        f"transaction_data.csv headers drifted from TRANS_TYPES: {missing_dtype_cols}"
     
     data_list = [camp_desc, camp_table, causal_data, coupon_redempt, 
                  coupon, hh_demographic, product, transaction]
@@ -141,11 +200,22 @@ def process_datasets():
     transaction.rename(columns={"household_key": "household_id"}, inplace=True)
     coupon_redempt.rename(columns={"household_key": "household_id"}, inplace=True)
     
+    # Low-cardinality strings to category so groupbys hash small int codes
+    # instead of utf-8 keys
+    for col in ["department", "brand", "commodity_desc", "sub_commodity_desc"]:
+        if col in product.columns:
+            product[col] = product[col].astype("category")
+
+    for col in ["age_desc", "marital_status_code", "income_desc", "homeowner_desc",
+                "hh_comp_desc", "household_size_desc", "kid_category_desc"]:
+        if col in hh_demographic.columns:
+            hh_demographic[col] = hh_demographic[col].astype("category")
+
     print("Creating derived datasets...")
     
     # basket_fact dataset
     basket_fact = (transaction
-                   .groupby(["household_id","basket_id","day"], as_index=False)
+                   .groupby(["household_id","basket_id","day"], as_index=False, observed=True, sort=False)
                    .agg(
                        n_items=("product_id","count"),
                        qty=("quantity","sum"),
@@ -159,7 +229,7 @@ def process_datasets():
     customer_features = create_customer_features(transaction, hh_demographic, coupon_redempt)
     
     # Create product analysis
-    full_product_df, product_segment_performance, top_products_by_segment = create_product_analysis(
+    product_segment_performance, top_products_by_segment = create_product_analysis(
         transaction, product, customer_features[["household_id", "segment"]]
     )
     
@@ -172,24 +242,24 @@ def process_datasets():
     print("Saving processed datasets...")
     
     datasets_to_save = {
-        "campaign_desc_processed.csv": camp_desc,
-        "campaign_table_processed.csv": camp_table,
-        "causal_data_processed.csv": causal_data,
-        "coupon_redempt_processed.csv": coupon_redempt,
-        "coupon_processed.csv": coupon,
-        "hh_demographic_processed.csv": hh_demographic,
-        "product_processed.csv": product,
-        "transaction_data_processed.csv": transaction,
-        "basket_fact.csv": basket_fact,
-        "customer_features.csv": customer_features,
-        "segment_profile.csv": segment_profile_df,
-        "product_segment_performance.csv": product_segment_performance,
-        "top_products_by_segment.csv": top_products_by_segment
+        "campaign_desc_processed.parquet": camp_desc,
+        "campaign_table_processed.parquet": camp_table,
+        "causal_data_processed.parquet": causal_data,
+        "coupon_redempt_processed.parquet": coupon_redempt,
+        "coupon_processed.parquet": coupon,
+        "hh_demographic_processed.parquet": hh_demographic,
+        "product_processed.parquet": product,
+        "transaction_data_processed.parquet": transaction,
+        "basket_fact.parquet": basket_fact,
+        "customer_features.parquet": customer_features,
+        "segment_profile.parquet": segment_profile_df,
+        "product_segment_performance.parquet": product_segment_performance,
+        "top_products_by_segment.parquet": top_products_by_segment
     }
-    
+
     for filename, df in datasets_to_save.items():
         filepath = os.path.join(processed_dir, filename)
-        df.to_csv(filepath, index=False)
+        save_df(df, filepath)
         print(f"Saved: {filename} ({len(df):,} rows, {len(df.columns)} columns)")
     
     print(f"\nAll processed datasets saved to: {processed_dir}")